@@ -17,6 +17,8 @@ class DataFrameToFile:
     A class used to write a pandas DataFrame to a text file with a custom header.
     """
 
+    buffer_size = 8 * 1024 * 1024  # bytes
+
     def __init__(self, df: pd.DataFrame):
         """
         Parameters
@@ -45,24 +47,25 @@ class DataFrameToFile:
         if not self.include_energy:
             columns_to_write.remove("energy_mev")
 
-        # Write header to file
-        with open(file_path, "w", encoding="utf-8") as f:
-            header = ", ".join(
-                f"{column} ({self.units[column]})" for column in columns_to_write
-            )
-            f.write(header + "\n")
+        header = ", ".join(
+            f"{column} ({self.units[column]})" for column in columns_to_write
+        )
 
-        # Append DataFrame to file
+        # Write header and DataFrame through a single file handle, with a large
+        # buffer to reduce the number of system calls for big exports
         logger.info("Writing dataframe to file. This may take a while...\n")
-        self.df.to_csv(
-            file_path,
-            columns=columns_to_write,
-            index=False,
-            header=False,
-            sep=",",
-            float_format="%.7e",
-            mode="a",
-        )
+        with open(
+            file_path, "w", encoding="utf-8", buffering=self.buffer_size
+        ) as f:
+            f.write(header + "\n")
+            self.df.to_csv(
+                f,
+                columns=columns_to_write,
+                index=False,
+                header=False,
+                sep=",",
+                float_format="%.7e",
+            )
         logger.info("Wrote %s\n", file_path)
 
         # Compute and log the file size
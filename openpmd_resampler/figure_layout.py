@@ -1,5 +1,7 @@
+import functools
 from typing import List, Optional
 
+import numpy as np
 from matplotlib.backends.backend_agg import FigureCanvasAgg
 from matplotlib.figure import Figure
 from matplotlib.gridspec import GridSpec
@@ -23,17 +25,23 @@ class FigureLayout:
         list containing the number of columns in each row
     fig : matplotlib.figure.Figure
         the created figure
-    axs : list of list of matplotlib.axes.Axes
-        the subplot axes
+    axs : dict of (int, int) to matplotlib.axes.Axes
+        the subplot axes, keyed by their (row, col) position
 
     Methods
     -------
     compute_dpi(W_px: int, H_px: int, D_in: float) -> float:
         computes the DPI of a screen
-    create_figure_and_subplots(pad: float = 3.0, h_pad: float = 3.0, w_pad: float = 3.0) -> None:
+    create_figure_and_subplots() -> None:
         creates a matplotlib figure and a grid of subplots
+    tight_layout() -> None:
+        fits the subplots to the figure, only once
+    reset() -> None:
+        clears the subplots, for reusing the figure
     savefig(filename: str) -> None:
         saves the figure to a file
+    to_rgb() -> np.ndarray:
+        rasterizes the figure into an array of pixels
     """
 
     def __init__(
@@ -43,6 +51,9 @@ class FigureLayout:
         H_px: Optional[int] = 900,
         D_in: Optional[float] = 13.3,
         dpi: Optional[float] = None,
+        pad: float = 3.0,
+        h_pad: float = 3.0,
+        w_pad: float = 3.0,
     ):
         """
         Parameters
@@ -55,6 +66,15 @@ class FigureLayout:
             The height of the screen in pixels (default is DEFAULT_H_PX)
         dpi : float, optional
             The dots per inch of the screen (default is computed via compute_dpi)
+        pad : float, optional
+            Padding between the figure edge and the edges of subplots,
+            as a fraction of the font size (default is 3.0)
+        h_pad : float, optional
+            Height padding between edges of adjacent subplots, as a fraction
+            of the font size (default is 3.0)
+        w_pad : float, optional
+            Width padding between edges of adjacent subplots, as a fraction
+            of the font size (default is 3.0)
         """
 
         self.layout = layout
@@ -62,70 +82,90 @@ class FigureLayout:
         self.H_px = H_px
         self.D_in = D_in
         self.dpi = dpi if dpi else self.compute_dpi()
+        # Convert pixels to inches for figure size
+        self._figsize_in = (self.W_px / self.dpi, self.H_px / self.dpi)
+        self.pad = pad
+        self.h_pad = h_pad
+        self.w_pad = w_pad
+        self._layout_done = False
         self.fig, self.axs = self.create_figure_and_subplots()
 
     def compute_dpi(self) -> float:
         """Compute the DPI of a screen."""
-        return (self.W_px**2 + self.H_px**2) ** 0.5 / self.D_in
+        return self._screen_dpi(self.W_px, self.H_px, self.D_in)
+
+    @staticmethod
+    @functools.lru_cache(maxsize=8)
+    def _screen_dpi(W_px: int, H_px: int, D_in: float) -> float:
+        return (W_px**2 + H_px**2) ** 0.5 / D_in
 
     def get_ax(self, row, col):
-        nrows, ncols = len(self.axs), len(self.axs[0])
-        if row >= nrows or col >= ncols:
+        try:
+            return self.axs[(row, col)]
+        except KeyError:
             raise IndexError(
-                f"Axes index ({row, col}) is out of bounds for axs with size {nrows}x{ncols}."
-            )
-        return self.axs[row][col]
+                f"Axes index ({row, col}) is out of bounds for layout {self.layout}."
+            ) from None
 
-    def create_figure_and_subplots(
-        self, pad: float = 3.0, h_pad: float = 3.0, w_pad: float = 3.0
-    ) -> None:
+    def create_figure_and_subplots(self) -> None:
         """
         Create a matplotlib figure and a grid of subplots.
 
-        Parameters
-        ----------
-        pad : float, optional
-            Padding between the figure edge and the edges of subplots,
-            as a fraction of the font size (default is 3.0)
-        h_pad : float, optional
-            Height padding between edges of adjacent subplots, as a fraction
-            of the font size (default is 3.0)
-        w_pad : float, optional
-            Width padding between edges of adjacent subplots, as a fraction
-            of the font size (default is 3.0)
+        The Agg canvas and the tight layout are deferred until the figure
+        is actually drawn, see ``tight_layout`` and ``savefig``.
         """
 
-        # Convert pixels to inches for figure size
-        W_in = self.W_px / self.dpi
-        H_in = self.H_px / self.dpi
-
         # Create figure
-        fig = Figure(figsize=(W_in, H_in), dpi=self.dpi)
-
-        # Required for drawing onto the figure
-        FigureCanvasAgg(fig)
+        fig = Figure(figsize=self._figsize_in, dpi=self.dpi)
 
         # Create a grid for the subplots
         nrows = len(self.layout)
         gs = GridSpec(nrows, 1, figure=fig)  # One column at the top level
 
-        # Create subplots
-        axs = []
+        # Create subplots, keyed by position since rows can have different lengths
+        axs = {}
         for i, ncols in enumerate(self.layout):
             # Create a new GridSpec for this row with the appropriate number of columns
             gs_i = gs[i].subgridspec(1, ncols)
 
-            row = []
             for j in range(ncols):
-                ax = fig.add_subplot(gs_i[0, j])
-                row.append(ax)
-            axs.append(row)
-
-        # To make the plots fill the figure as much as possible
-        fig.tight_layout(pad=pad, h_pad=h_pad, w_pad=w_pad)
+                axs[(i, j)] = fig.add_subplot(gs_i[0, j])
 
         return fig, axs
 
+    def reset(self) -> None:
+        """
+        Clear the figure, so that it can be reused for a new plot with the same
+        layout instead of creating a new figure and subplots.
+
+        The subplots of the grid are cleared, while any other axes that were added
+        afterwards (twin axes, colorbars) are removed.
+        """
+        grid_axes = list(self.axs.values())
+        for ax in self.fig.axes:
+            if not any(ax is grid_ax for grid_ax in grid_axes):
+                ax.remove()
+        for ax in grid_axes:
+            ax.cla()
+
+    def _attach_canvas(self) -> None:
+        """Attach an Agg canvas to the figure, required for drawing onto it."""
+        if not isinstance(self.fig.canvas, FigureCanvasAgg):
+            FigureCanvasAgg(self.fig)
+
+    def tight_layout(self) -> None:
+        """
+        Make the plots fill the figure as much as possible.
+
+        The layout pass is only done once, so callers which reposition the
+        subplots afterwards (e.g. to make room for a colorbar) keep their changes.
+        """
+        if self._layout_done:
+            return
+        self._attach_canvas()
+        self.fig.tight_layout(pad=self.pad, h_pad=self.h_pad, w_pad=self.w_pad)
+        self._layout_done = True
+
     def savefig(self, output_filename: str) -> None:
         """
         Save the figure to a file.
@@ -136,4 +176,20 @@ class FigureLayout:
             The name of the file to save the figure to
         """
 
+        self.tight_layout()
         self.fig.savefig(output_filename, dpi=self.dpi, transparent=False)
+
+    def to_rgb(self) -> np.ndarray:
+        """
+        Rasterize the figure, without encoding it into an image file.
+
+        Returns
+        -------
+        np.ndarray
+            The pixels of the figure, as an array of shape (height, width, 3)
+        """
+
+        self.tight_layout()
+        self._attach_canvas()
+        self.fig.canvas.draw()
+        return np.array(self.fig.canvas.buffer_rgba())[..., :3]
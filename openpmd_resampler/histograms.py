@@ -1,9 +1,11 @@
+import weakref
 from abc import ABC, abstractmethod
-from typing import Callable, Tuple
+from typing import Any, Callable, Dict, Optional, Tuple
 
 import numpy as np
 
 from .plot_utils import add_grid, customize_tick_labels
+from .utils import CHUNK_SIZE, chunks
 
 
 def set_y_axis_tick_color(axes_and_colors):
@@ -21,6 +23,172 @@ def set_common_x_axis_limits(ax1, ax2):
     ax2.set_xlim(x_min, x_max)
 
 
+def min_max(values: np.ndarray) -> Tuple[float, float]:
+    """
+    Minimum and maximum of ``values``, in a single sweep over memory for double
+    precision, see ``utils.chunks``.
+    """
+    if values.size <= CHUNK_SIZE or values.itemsize < 8:
+        return values.min(), values.max()
+
+    lo, hi = np.inf, -np.inf
+    for chunk in chunks(values):
+        lo = min(lo, chunk.min())
+        hi = max(hi, chunk.max())
+    return lo, hi
+
+
+def memoize_by_identity(
+    cache: dict,
+    max_size: int,
+    arrays: Tuple[np.ndarray, ...],
+    params: tuple,
+    compute: Callable[[], Any],
+) -> Any:
+    """
+    Return the cached result for ``arrays`` and ``params``, calling ``compute``
+    on a miss. The oldest entry is evicted once ``max_size`` entries are stored.
+
+    Entries are keyed by the identity of the arrays and only hold weak
+    references to them, so the cache never keeps the particle data alive.
+    An entry is evicted as soon as one of its arrays is garbage collected,
+    so that the results computed from dead arrays are not kept either.
+    """
+    key = (*map(id, arrays), *params)
+    entry = cache.get(key)
+    if entry is not None:
+        array_refs, result = entry
+        if all(ref() is array for ref, array in zip(array_refs, arrays)):
+            return result
+
+    result = compute()
+
+    if len(cache) >= max_size:
+        cache.pop(next(iter(cache)))
+    cache[key] = (tuple(weakref.ref(array) for array in arrays), result)
+    for array in arrays:
+        weakref.finalize(array, cache.pop, key, None)
+
+    return result
+
+
+_RANGE_CACHE_SIZE = 32
+_range_cache = {}
+
+
+def cached_min_max(values: np.ndarray) -> Tuple[float, float]:
+    """
+    Memoized ``min_max``, so that the range of each column is only computed
+    once, however many histograms and images are binned over it.
+    """
+    return memoize_by_identity(
+        _range_cache, _RANGE_CACHE_SIZE, (values,), (), lambda: min_max(values)
+    )
+
+
+def bin_indices(values: np.ndarray, bins: int) -> Tuple[np.ndarray, Tuple[float, float]]:
+    """
+    Index of the equal-width bin of each of ``values``, over ``bins`` bins spanning
+    their range, computed arithmetically in a single pass instead of a binary
+    search over the bin edges.
+    Returns indices, (lo, hi).
+    """
+    lo, hi = cached_min_max(values)
+    if lo == hi:
+        lo, hi = lo - 0.5, hi + 0.5
+
+    indices = ((values - lo) * (bins / (hi - lo))).astype(np.intp)
+    # The maximum value belongs to the last (closed) bin
+    np.clip(indices, 0, bins - 1, out=indices)
+
+    return indices, (lo, hi)
+
+
+_BIN_INDEX_CACHE_SIZE = 16
+_bin_index_cache = {}
+
+
+def cached_bin_indices(
+    values: np.ndarray, bins: int
+) -> Tuple[np.ndarray, Tuple[float, float]]:
+    """
+    Memoized ``bin_indices``, reused by all the images which bin a column along
+    an axis of the same size, such as the panels of a row sharing their x column.
+    The indices are stored as 16-bit integers when they fit, to keep the cache small.
+    """
+
+    def compute():
+        indices, value_range = bin_indices(values, bins)
+        if bins <= np.iinfo(np.int16).max:
+            indices = indices.astype(np.int16)
+        return indices, value_range
+
+    return memoize_by_identity(
+        _bin_index_cache, _BIN_INDEX_CACHE_SIZE, (values,), (bins,), compute
+    )
+
+
+def weighted_histogram(
+    values: np.ndarray, weights: Optional[np.ndarray], bins: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Weighted histogram of ``values`` over ``bins`` equal-width bins spanning their range.
+    Plain counts are returned if ``weights`` is None.
+
+    Same result as ``np.histogram(values, bins, weights=weights)``, but the bin of
+    each value is computed arithmetically in a single pass, followed by a
+    ``np.bincount``, instead of a binary search over the bin edges.
+    Returns counts, bin_edges.
+    """
+    indices, (lo, hi) = bin_indices(values, bins)
+    counts = np.bincount(indices, weights=weights, minlength=bins)
+
+    return counts, np.linspace(lo, hi, bins + 1)
+
+
+def weighted_histogram2d(
+    x: np.ndarray, y: np.ndarray, weights: np.ndarray, bins: Tuple[int, int]
+) -> Tuple[np.ndarray, Tuple[Tuple[float, float], Tuple[float, float]]]:
+    """
+    Weighted 2D histogram of ``x`` and ``y`` over ``bins = (nx, ny)`` equal-width
+    bins spanning their ranges, laid out as an image of shape (ny, nx).
+
+    The flat bin index of each point is combined from its two 1D bin indices,
+    which are cached per column and number of bins, followed by a single
+    ``np.bincount``.
+    Returns counts, (x_range, y_range).
+    """
+    nx, ny = bins
+    x_indices, x_range = cached_bin_indices(x, nx)
+    y_indices, y_range = cached_bin_indices(y, ny)
+
+    flat_indices = y_indices.astype(np.intp)
+    flat_indices *= nx
+    flat_indices += x_indices
+    counts = np.bincount(flat_indices, weights=weights, minlength=nx * ny)
+
+    return counts.reshape(ny, nx), (x_range, y_range)
+
+
+_HISTOGRAM_CACHE_SIZE = 32
+_histogram_cache = {}
+
+
+def cached_weighted_histogram(
+    values: np.ndarray, weights: np.ndarray, bins: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Memoized ``weighted_histogram``, for repeated histograms of the same arrays.
+    """
+    return memoize_by_identity(
+        _histogram_cache,
+        _HISTOGRAM_CACHE_SIZE,
+        (values, weights),
+        (bins,),
+        lambda: weighted_histogram(values, weights, bins),
+    )
+
+
 class Histogram(ABC):
     bins = 1000
     weight_col = "weights"
@@ -29,10 +197,20 @@ class Histogram(ABC):
         self,
         df,
         weight_col=None,
+        arrays: Optional[Dict[str, np.ndarray]] = None,
     ):
         self.df = df
         self.other = None
         self.weight_col = weight_col if weight_col is not None else self.weight_col
+        self.arrays = arrays
+
+    def column(self, col) -> np.ndarray:
+        """
+        The values of column ``col``, taken from the precomputed arrays if available.
+        """
+        if self.arrays is not None and col in self.arrays:
+            return self.arrays[col]
+        return self.df[col].to_numpy()
 
     @abstractmethod
     def compute_histogram(self) -> Tuple[np.ndarray, np.ndarray]:
@@ -119,17 +297,13 @@ class HistogramPlot(ABC):
 
 
 class StandardHistogram(Histogram):
-    def __init__(self, df, col, weight_col=None):
-        super().__init__(df, weight_col)
+    def __init__(self, df, col, weight_col=None, arrays=None):
+        super().__init__(df, weight_col, arrays)
         self.col = col
 
     def compute_histogram(self):
-        linear_bins = np.histogram_bin_edges(self.df[self.col], bins=self.bins)
-
-        counts, bin_edges = np.histogram(
-            self.df[self.col],
-            bins=linear_bins,
-            weights=self.df[self.weight_col],
+        counts, bin_edges = cached_weighted_histogram(
+            self.column(self.col), self.column(self.weight_col), self.bins
         )
 
         density = counts
@@ -165,18 +339,42 @@ class LogHistogramPlot(StandardHistogramPlot):
 class WeightHistogram(Histogram):
     bins = 100
 
+    @staticmethod
+    def distinct_weights(
+        weights: np.ndarray,
+    ) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """
+        Macroparticle weights are often integer counts of 'real' particles. Their
+        distinct values are then tallied with a linear ``np.bincount`` scan, so
+        that the logarithm is only taken once per distinct weight.
+        Returns the values and how many times each occurs, or the weights
+        themselves and None, if they are not small enough integers.
+        """
+        integer_weights = weights.astype(np.int64)
+        if (
+            integer_weights.min() < 1
+            or integer_weights.max() > weights.size
+            or not np.array_equal(integer_weights, weights)
+        ):
+            return weights, None
+
+        multiplicities = np.bincount(integer_weights)
+        values = np.flatnonzero(multiplicities)
+        return values, multiplicities[values]
+
     def compute_histogram(self):
-        # Define the logarithmic bins
-        log_bins = np.logspace(
-            np.log10(self.df[self.weight_col].min()),
-            np.log10(self.df[self.weight_col].max()),
-            num=self.bins,
-            base=10,
+        weights = self.column(self.weight_col)
+        values, multiplicities = self.distinct_weights(weights)
+
+        # Logarithmic bins are equal-width bins of log10(w), which can be
+        # filled in a single pass without searching the bin edges
+        counts, log_bin_edges = weighted_histogram(
+            np.log10(values), multiplicities, self.bins - 1
         )
-        counts, bin_edges = np.histogram(self.df[self.weight_col], bins=log_bins)
+        bin_edges = np.power(10, log_bin_edges)
 
         # The width of the bins in log scale is the difference in log-space of the bin edges
-        bin_width = np.diff(np.log10(bin_edges))
+        bin_width = np.diff(log_bin_edges)
 
         # Now we calculate the number of entries per bin divided by the width of the bin.
         # This is equivalent to the density of entries per bin in log scale.
@@ -219,11 +417,13 @@ class WeightDistributionPlot(HistogramPlot):
 
 class EqualWeightHistogram(WeightHistogram):
     def compute_histogram(self):
+        weights = self.column(self.weight_col)
+
         # Check if all weights are equal
-        if self.df[self.weight_col].nunique() == 1:
-            weight_value = self.df[self.weight_col].iloc[0]  # take the first weight
+        if weights.min() == weights.max():
+            weight_value = weights[0]  # take the first weight
 
-            dN = self.df.shape[0]
+            dN = weights.shape[0]
             dlnw = 1  # an infinitesimally small value for the natural logarithm of the same weight
 
             # Plot a single spike. Height is dN/dln(w),
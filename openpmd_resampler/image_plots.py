@@ -1,24 +1,54 @@
 from abc import ABC, abstractmethod
-from typing import Callable
+from typing import Callable, Dict, Optional, Tuple
 
-import datashader as ds
-from datashader.mpl_ext import dsshow
+import numpy as np
+from matplotlib.colors import LogNorm, Normalize
 
+from .histograms import weighted_histogram2d
 from .plot_utils import galactic_spectrum, customize_tick_labels
 
 
-class DataShaderPlot(ABC):
+class ImagePlot(ABC):
     cmap = galactic_spectrum
     norm = "log"
     weight_col = "weights"
 
-    def __init__(self, ax, df, col_x, col_y, x_label, y_label) -> None:
+    def __init__(
+        self,
+        ax,
+        df,
+        col_x,
+        col_y,
+        x_label,
+        y_label,
+        norm=None,
+        arrays: Optional[Dict[str, np.ndarray]] = None,
+    ) -> None:
         self.ax = ax
         self.df = df
         self.col_x = col_x
         self.col_y = col_y
         self.x_label = x_label
         self.y_label = y_label
+        self.norm = norm if norm is not None else self.norm
+        self.arrays = arrays
+
+    def column(self, col) -> np.ndarray:
+        """
+        The values of column ``col``, taken from the precomputed arrays if available.
+        """
+        if self.arrays is not None and col in self.arrays:
+            return self.arrays[col]
+        return self.df[col].to_numpy()
+
+    def get_norm(self) -> Normalize:
+        """
+        The color normalization. A ``Normalize`` instance is used as is, so it can
+        be shared between several plots, while "log" creates an autoscaled ``LogNorm``.
+        """
+        if isinstance(self.norm, Normalize):
+            return self.norm
+        return LogNorm() if self.norm == "log" else Normalize()
 
     def default_plot_styling(self):
         return self.standard_plot_styling
@@ -53,15 +83,41 @@ class DataShaderPlot(ABC):
         return self.ax
 
 
-class StandardDataShaderPlot(DataShaderPlot):
+class StandardImagePlot(ImagePlot):
+    def __init__(
+        self, ax, df, col_x, col_y, x_label, y_label, norm=None, arrays=None
+    ) -> None:
+        super().__init__(ax, df, col_x, col_y, x_label, y_label, norm, arrays)
+        self._agg = None
+
+    def aggregate(self) -> Tuple[np.ndarray, Tuple[Tuple[float, float], ...]]:
+        """
+        Sum the weights of the particles falling into each pixel of the axes.
+
+        The aggregate is a weighted 2D histogram with one bin per pixel, computed
+        once and reused.
+        Returns counts, (x_range, y_range).
+        """
+        if self._agg is None:
+            _, _, width, height = self.ax.patch.get_window_extent().bounds
+            self._agg = weighted_histogram2d(
+                self.column(self.col_x),
+                self.column(self.col_y),
+                self.column(self.weight_col),
+                (int(width + 0.5), int(height + 0.5)),
+            )
+        return self._agg
+
     def plot(self):
-        mappable = dsshow(
-            self.df,
-            ds.Point(self.col_x, self.col_y),
-            ds.sum(self.weight_col),
-            norm=self.norm,
+        counts, ((x_min, x_max), (y_min, y_max)) = self.aggregate()
+        mappable = self.ax.imshow(
+            # Empty pixels are left transparent
+            np.ma.masked_equal(counts, 0),
+            norm=self.get_norm(),
             cmap=self.cmap,
+            extent=(x_min, x_max, y_min, y_max),
+            origin="lower",
+            interpolation="none",
             aspect="auto",
-            ax=self.ax,
         )
         return mappable
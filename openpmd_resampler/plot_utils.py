@@ -1,4 +1,5 @@
 import matplotlib.colors as mcolors
+import numpy as np
 from matplotlib.ticker import ScalarFormatter
 
 
@@ -16,13 +17,28 @@ def generate_custom_colormap(colors: list):
 
 
 color_set = ["black", "darkblue", "lightblue", "purple", "yellow"]
-galactic_spectrum = generate_custom_colormap(color_set)
+# Sampled once into a fixed lookup table, instead of interpolating the segments
+galactic_spectrum = mcolors.ListedColormap(
+    generate_custom_colormap(color_set)(np.linspace(0.0, 1.0, 256)),
+    name="galactic_spectrum",
+)
+
+
+def scientific_formatter() -> ScalarFormatter:
+    """
+    Formatter for tick labels in scientific notation, with the exponent shown
+    above the axis. Formatters keep a reference to their axis, so each axis
+    needs its own instance.
+    """
+    formatter = ScalarFormatter(useMathText=True)
+    formatter.set_scientific(True)
+    formatter.set_powerlimits((0, 0))
+    return formatter
 
 
 def customize_tick_labels(ax):
     for axis in [ax.yaxis, ax.xaxis]:
-        axis.set_major_formatter(ScalarFormatter(useMathText=True))
-    ax.ticklabel_format(style="sci", axis="both", scilimits=(0, 0))
+        axis.set_major_formatter(scientific_formatter())
     ax.tick_params(axis="both", which="major", labelsize=8)
 
 
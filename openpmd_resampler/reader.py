@@ -1,5 +1,8 @@
+import functools
+import importlib
+import os
 from enum import Enum
-from typing import Tuple
+from typing import List, Optional, Sequence, Tuple
 
 import numpy as np
 import openpmd_api as io
@@ -22,10 +25,33 @@ class Attributes(Enum):
     MOMENTUM = "momentum"
 
 
+def electron_energy(
+    momentum_x: np.ndarray, momentum_y: np.ndarray, momentum_z: np.ndarray
+) -> np.ndarray:
+    """
+    The total energy of the electrons in MeV, from their momenta in MeV/c.
+
+    The sum of squares is accumulated in place, reusing a single scratch array,
+    instead of allocating a temporary for each term of the expression.
+    """
+    energy_mev = np.square(momentum_x)
+    squared = np.empty_like(energy_mev)
+    for momentum in (momentum_y, momentum_z):
+        energy_mev += np.square(momentum, out=squared)
+    energy_mev += constants.electron_mass_mev_c2**2
+    return np.sqrt(energy_mev, out=energy_mev)
+
+
 class OpenPMDLoader:
-    def __init__(self, file_path: str, particle_species_name: str = "e_all"):
+    def __init__(
+        self,
+        file_path: str,
+        particle_species_name: str = "e_all",
+        records: Sequence[Attributes] = (Attributes.POSITION, Attributes.MOMENTUM),
+    ):
         self.file_path = str(file_path)
         self.particle_species_name = particle_species_name
+        self.attributes = self.get_attributes(records)
 
         self.series = self.open_series()
 
@@ -46,23 +72,22 @@ class OpenPMDLoader:
             raise ValueError(f"Provided species '{self.particle_species_name}' not available. Detected species: {detected_species}")
         self.electrons = self.iteration.particles[self.particle_species_name]
 
-        self.data, self.units = self.get_particle_data_and_units()
+        self.block, self.units = self.get_particle_data_and_units()
+        self.data = dict(zip(self.units, self.block))
 
-        self.series.flush()
         del self.series
 
         self.rescale_momenta()
-        self.convert_to_SI()
-        self.add_offsets()
+        self.convert_units()
         self.swap_yz_axes()
-        self.convert_to_nuclear_units()
         self.add_energy_column()
 
         self.column_name_mappings = self.get_column_name_mappings()
-        self.df = pd.DataFrame(self.data, dtype=np.float32)
+        self.df = self.build_dataframe()
         self.df.rename(columns=self.column_name_mappings, inplace=True)
 
         del self.data
+        del self.block
         del self.units
 
 
@@ -85,43 +110,98 @@ class OpenPMDLoader:
         )
         return iteration
 
-    def get_particle_data_and_units(self) -> Tuple[dict, dict]:
-        data = {}
-        units = {}
-        dimensions = {}
-
-        for attribute in Attributes:
+    @staticmethod
+    def get_attributes(records: Sequence[Attributes]) -> List[Attributes]:
+        """
+        The attributes to be loaded for the requested records, the weights are
+        always loaded. The position offsets are loaded along with the positions.
+        """
+        return [
+            attribute
+            for attribute in Attributes
+            if attribute in records
+            or (
+                attribute is Attributes.POSITION_OFFSET
+                and Attributes.POSITION in records
+            )
+        ]
+
+    def get_record_components(self) -> dict:
+        """
+        The record components to be loaded, keyed by their column name.
+        Only the queued components are read on flush, so records which are
+        not needed cost no I/O.
+        """
+        record_components = {}
+        for attribute in self.attributes:
             for component in Components:
-                data[f"{attribute.value}_{component.value}"] = self.electrons[
-                    attribute.value
-                ][component.value].load_chunk()
-                units[f"{attribute.value}_{component.value}"] = self.electrons[
-                    attribute.value
-                ][component.value].unit_SI
-                dimensions[f"{attribute.value}_{component.value}"] = self.electrons[
-                    attribute.value
-                ].unit_dimension
-                np.testing.assert_allclose(
-                    dimensions[f"{attribute.value}_{component.value}"],
-                    getattr(expected_dims, attribute.value),
-                    atol=1e-9,
-                    rtol=0,
-                )
-
-        data["weights"] = self.electrons["weighting"][
-            io.Record_Component.SCALAR
-        ].load_chunk()
-        units["weights"] = self.electrons["weighting"][
+                record_components[
+                    f"{attribute.value}_{component.value}"
+                ] = self.electrons[attribute.value][component.value]
+        record_components["weights"] = self.electrons["weighting"][
             io.Record_Component.SCALAR
-        ].unit_SI
-        dimensions["weights"] = self.electrons["weighting"].unit_dimension
-        np.testing.assert_allclose(
-            dimensions["weights"], expected_dims.weights, atol=1e-9, rtol=0
-        )
+        ]
+        return record_components
+
+    def _check_dimension(self, record_name: str, expected: Tuple[float, ...]):
+        # Plain Python on the 7 powers, cheaper than NumPy for such short vectors
+        actual = self.electrons[record_name].unit_dimension
+        if len(actual) != len(expected) or any(
+            abs(a - e) > 1e-9 for a, e in zip(actual, expected)
+        ):
+            raise ValueError(
+                f"Unexpected unit dimension {actual} for '{record_name}', expected {expected}."
+            )
+
+    def check_dimensions(self):
+        for attribute in self.attributes:
+            self._check_dimension(
+                attribute.value, getattr(expected_dims, attribute.value)
+            )
+        self._check_dimension("weighting", expected_dims.weights)
+
+    def get_particle_data_and_units(self) -> Tuple[np.ndarray, dict]:
+        """
+        Load the record components as the rows of one (columns, N) block, along
+        with their units, keyed by column name in the same order as the rows.
+        """
+        record_components = self.get_record_components()
+
+        # Enqueue all the loads before a single flush, so that the backend
+        # can perform the reads in one batch
+        dtypes = {
+            record_component.dtype for record_component in record_components.values()
+        }
+        if len(dtypes) == 1:
+            # Read straight into the rows of a contiguous block, the buffer
+            # must have the same dtype as the records
+            block = np.empty(
+                (len(record_components), record_components["weights"].shape[0]),
+                dtype=dtypes.pop(),
+            )
+            for row, record_component in zip(block, record_components.values()):
+                record_component.load_chunk(row)
+            self.series.flush()
+        else:
+            chunks = [
+                record_component.load_chunk()
+                for record_component in record_components.values()
+            ]
+            self.series.flush()
+            block = np.stack(chunks)
+
+        # Units and dimensions are metadata, available without flushing
+        units = {
+            column_name: record_component.unit_SI
+            for column_name, record_component in record_components.items()
+        }
+        self.check_dimensions()
 
-        return data, units
+        return block, units
 
     def rescale_momenta(self):
+        if Attributes.MOMENTUM not in self.attributes:
+            return
         macro_weighted = self.electrons[f"{Attributes.MOMENTUM.value}"].get_attribute(
             "macroWeighted"
         )
@@ -129,37 +209,100 @@ class OpenPMDLoader:
             "weightingPower"
         )
         if (macro_weighted == 1) and (weighting_power != 0):
+            # Computed once for all components, avoiding pow in the common case
+            if weighting_power == 1:
+                weights_power = np.reciprocal(self.data["weights"])
+            else:
+                weights_power = self.data["weights"] ** (-weighting_power)
             for component in Components:
                 self.data[
                     f"{Attributes.MOMENTUM.value}_{component.value}"
-                ] *= self.data["weights"] ** (-weighting_power)
+                ] *= weights_power
+
+    def convert_units(self):
+        """
+        Convert positions to μm and momenta to MeV/c, via SI units, and add the
+        offsets to the positions.
+
+        Both factors of each column are combined, and the whole (columns, N)
+        block is scaled in a single broadcast multiply. The offset rows are then
+        added to the position rows in one go, and the dictionary entries become
+        views of the remaining rows.
+        """
+        nuclear_conversion_factors = {
+            Attributes.POSITION.value: conversion_factors.position,
+            Attributes.POSITION_OFFSET.value: conversion_factors.position,
+            Attributes.MOMENTUM.value: conversion_factors.momentum,
+        }
+        column_names = list(self.units)
+        block = self.block
+        factors = np.array(
+            [
+                self.units[column_name]
+                * nuclear_conversion_factors.get(column_name.split("_")[0], 1.0)
+                for column_name in column_names
+            ],
+            dtype=block.dtype,
+        )
+        block *= factors[:, np.newaxis]
 
-    def convert_to_SI(self):
-        for column_name, unit_SI in self.units.items():
-            self.data[column_name] = (self.data[column_name] * unit_SI)
+        if Attributes.POSITION in self.attributes:
+            self.add_offsets(block, column_names)
 
-    def add_offsets(self):
-        for component in Components:
-            self.data[f"{Attributes.POSITION.value}_{component.value}"] += self.data[
-                f"{Attributes.POSITION_OFFSET.value}_{component.value}"
-            ]
-            del self.data[f"{Attributes.POSITION_OFFSET.value}_{component.value}"]
+        self.data = {
+            column_name: row
+            for column_name, row in zip(column_names, block)
+            if not column_name.startswith(Attributes.POSITION_OFFSET.value)
+        }
+
+    @staticmethod
+    def add_offsets(block: np.ndarray, column_names: List[str]):
+        # The components of each record are adjacent rows, see get_record_components
+        position_rows, offset_rows = (
+            slice(first_row, first_row + len(Components))
+            for first_row in (
+                column_names.index(f"{attribute.value}_{Components.X.value}")
+                for attribute in (Attributes.POSITION, Attributes.POSITION_OFFSET)
+            )
+        )
+        block[position_rows] += block[offset_rows]
 
     def swap_yz_axes(self):
         if self.swap_yz:
             for attribute in [Attributes.POSITION, Attributes.MOMENTUM]:
+                if attribute not in self.attributes:
+                    continue
                 self.data[f"{attribute.value}_y"], self.data[f"{attribute.value}_z"] = (
                     self.data[f"{attribute.value}_z"],
                     self.data[f"{attribute.value}_y"]
                 )
             logger.info("Swapping y and z axes.\n")
 
-    def convert_to_nuclear_units(self):
-        for attribute in [Attributes.POSITION, Attributes.MOMENTUM]:
-            for component in Components:
-                self.data[f"{attribute.value}_{component.value}"] *= getattr(
-                    conversion_factors, attribute.value
-                )
+    def build_dataframe(self) -> pd.DataFrame:
+        """
+        Assemble the particle data into a DataFrame.
+
+        Single precision halves the bandwidth of the downstream aggregations,
+        while the weights stay in double precision for accurate sums.
+        The float32 columns are copied once into a single (columns, N) block,
+        which pandas wraps as is, instead of consolidating separate arrays.
+        """
+        column_names = list(self.data)
+        float32_column_names = [name for name in column_names if name != "weights"]
+
+        block = np.empty(
+            (len(float32_column_names), len(self.data["weights"])), dtype=np.float32
+        )
+        for row, column_name in enumerate(float32_column_names):
+            block[row] = self.data[column_name]
+
+        df = pd.DataFrame(block.T, columns=float32_column_names, copy=False)
+        df.insert(
+            column_names.index("weights"),
+            "weights",
+            self.data["weights"].astype(np.float64),
+        )
+        return df
 
     def get_column_name_mappings(self):
         new_column_suffixes = {
@@ -176,12 +319,14 @@ class OpenPMDLoader:
         return column_name_mappings
 
     def add_energy_column(self):
-        momentum_x = self.data[f"{Attributes.MOMENTUM.value}_x"]
-        momentum_y = self.data[f"{Attributes.MOMENTUM.value}_y"]
-        momentum_z = self.data[f"{Attributes.MOMENTUM.value}_z"]
-
-        energy_mev = np.sqrt(momentum_x**2 + momentum_y**2 + momentum_z**2 + constants.electron_mass_mev_c2**2)
-        self.data["energy_mev"] = energy_mev
+        if Attributes.MOMENTUM not in self.attributes:
+            return
+        self.data["energy_mev"] = electron_energy(
+            *(
+                self.data[f"{Attributes.MOMENTUM.value}_{component.value}"]
+                for component in Components
+            )
+        )
 
 
 class DataFrameUpdater:
@@ -195,26 +340,32 @@ class DataFrameUpdater:
         return self._df_or_class_with_df.df
 
     def add_energy_column(self):
-        self.df["energy_mev"] = np.sqrt(
-            self.df["momentum_x_mev_c"] ** 2
-            + self.df["momentum_y_mev_c"] ** 2
-            + self.df["momentum_z_mev_c"] ** 2
-            + constants.electron_mass_mev_c2**2
+        self.df["energy_mev"] = electron_energy(
+            self.df["momentum_x_mev_c"].to_numpy(),
+            self.df["momentum_y_mev_c"].to_numpy(),
+            self.df["momentum_z_mev_c"].to_numpy(),
         )
 
 
 class DataAnalyzer:
-    def __init__(self, df: pd.DataFrame):
+    def __init__(self, df: pd.DataFrame, verbose: bool = True):
         self.df = df
-        self.data_stats()
+        # The descriptive statistics take several passes over the whole dataset
+        if verbose:
+            self.data_stats()
 
     def data_stats(self):
         logger.info("The particle bunch is propagating along the z direction.\n")
 
         dataset_info(self.df)
 
-        weighted_average_energy = np.average(
-            self.df["energy_mev"], weights=self.df["weights"]
+        if "energy_mev" not in self.df:
+            return
+
+        # A single dot product, rather than the separate passes of np.average
+        weights = self.df["weights"].to_numpy()
+        weighted_average_energy = (
+            np.dot(self.df["energy_mev"].to_numpy(), weights) / weights.sum()
         )
         logger.info(
             "The (weighted) mean energy is %.6e MeV.\n", weighted_average_energy
@@ -222,18 +373,101 @@ class DataAnalyzer:
 
 
 class ParticleDataReader:
-    def __init__(self, file_path: str, particle_species_name: str = "e_all"):
-        self.loader = OpenPMDLoader(file_path, particle_species_name)
+    def __init__(
+        self,
+        file_path: str,
+        particle_species_name: str = "e_all",
+        verbose: bool = True,
+        records: Sequence[Attributes] = (Attributes.POSITION, Attributes.MOMENTUM),
+    ):
+        self.loader = OpenPMDLoader(file_path, particle_species_name, records)
         self.updater = DataFrameUpdater(self.loader.df)
-        self.analyzer = DataAnalyzer(self.updater.df)
+        self.analyzer = DataAnalyzer(self.updater.df, verbose)
 
     @classmethod
     def from_file(
-        cls, file_path: str, particle_species_name: str = "e_all"
+        cls,
+        file_path: str,
+        particle_species_name: str = "e_all",
+        cache_path: Optional[str] = None,
+        verbose: bool = True,
     ) -> pd.DataFrame:
-        reader = cls(file_path, particle_species_name)
+        """
+        Read the particle data into a DataFrame.
+
+        If ``cache_path`` is given, the DataFrame is written there as a Parquet file
+        after the first read, and later calls load it from there instead of
+        decoding the openPMD file again. A cache older than the openPMD file is
+        considered stale and rebuilt, see also ``cache_path_for``.
+        With ``verbose=False``, the descriptive statistics are not logged.
+        """
+        if cache_path is not None:
+            cls.check_cache_support()
+
+        if (
+            cache_path is not None
+            and os.path.exists(cache_path)
+            and os.path.getmtime(cache_path) >= os.path.getmtime(file_path)
+        ):
+            logger.info("Reading cached particle data from %s.\n", cache_path)
+            return DataAnalyzer(pd.read_parquet(cache_path), verbose).df
+
+        reader = cls(file_path, particle_species_name, verbose)
+        if cache_path is not None:
+            reader.df.to_parquet(cache_path, compression="snappy")
+            logger.info("Wrote %s\n", cache_path)
         return reader.df
 
+    @staticmethod
+    def check_cache_support() -> None:
+        """
+        Make sure that a Parquet engine, required by the cache of ``from_file``,
+        is installed. Raises an ImportError otherwise, rather than failing only
+        after the openPMD file has been read.
+        """
+        for engine in ("pyarrow", "fastparquet"):
+            try:
+                importlib.import_module(engine)
+                return
+            except ImportError:
+                pass
+        raise ImportError(
+            "Caching the particle data requires a Parquet engine such as pyarrow, "
+            "which can be installed via `pixi add pyarrow`."
+        )
+
+    @staticmethod
+    def cache_path_for(file_path: str, particle_species_name: str = "e_all") -> str:
+        """
+        The default Parquet cache of ``from_file``, next to the openPMD file and
+        named after the particle species, e.g. ``lwfa.e_all.parquet`` for ``lwfa.h5``.
+        """
+        root, _ = os.path.splitext(str(file_path))
+        return f"{root}.{particle_species_name}.parquet"
+
     @property
     def df(self):
         return self.analyzer.df
+
+
+@functools.lru_cache(maxsize=4)
+def _load_df(
+    file_path: str, particle_species_name: str, mtime_ns: int
+) -> pd.DataFrame:
+    return ParticleDataReader.from_file(file_path, particle_species_name)
+
+
+def load_df(file_path: str, particle_species_name: str = "e_all") -> pd.DataFrame:
+    """
+    Read the particle data into a DataFrame, keeping it in memory for the rest of
+    the session.
+
+    Meant for notebooks and scripts which read the same file repeatedly: reading the
+    same species of an unchanged file again returns it without decoding the file
+    again. Rewriting the file changes its modification time, so it is then read anew.
+    Each call returns a deep copy, so that modifying it does not corrupt later reads,
+    at the cost of keeping up to four extra copies of the data in memory.
+    Use ``ParticleDataReader.from_file`` to read the data only once.
+    """
+    path = os.path.realpath(file_path)
+    return _load_df(path, particle_species_name, os.stat(path).st_mtime_ns).copy()
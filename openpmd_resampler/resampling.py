@@ -48,15 +48,20 @@ class ParticleResampler:
         random_generator = np.random.default_rng(seed=42)
         number_of_initial_macroparticles = self.df.shape[0]
 
-        # Generate random indices for deletion
-        delete_indices = random_generator.choice(
+        # Generate random indices for the particles to keep, sorted so that
+        # the rows are gathered in their original order. For few remaining
+        # particles the generator samples them with Floyd's algorithm, in memory
+        # proportional to their number, and no shuffle is needed before sorting
+        keep_indices = random_generator.choice(
             number_of_initial_macroparticles,
-            size=number_of_initial_macroparticles - number_of_remaining_macroparticles,
+            size=number_of_remaining_macroparticles,
             replace=False,
+            shuffle=False,
         )
+        keep_indices.sort()
 
-        # Delete particles and weights at the selected indices
-        self.df.drop(delete_indices, inplace=True)
+        # Keep the particles and weights at the selected positions
+        self.df = self.df.take(keep_indices)
 
         # Calculate new weight coefficient and update weights
         weight_factor = (
@@ -126,11 +131,14 @@ class ParticleResampler:
         mean = self.df.mean()
         std = self.df.std()
 
-        # Standardize and add noise in-place
+        # Standardize and add noise in-place, drawn in the precision of each
+        # column so that single precision columns are not promoted
         for col in cols:
             self.df[col] = (self.df[col] - mean[col]) / std[col]
             epsilon = self.df[col].abs() * percentage
-            self.df[col] += random_generator.normal(0, epsilon)
+            self.df[col] += epsilon * random_generator.standard_normal(
+                self.df.shape[0], dtype=self.df[col].dtype
+            )
             self.df[col] = self.df[col] * std[col] + mean[col]
 
         self.df.reset_index(drop=True, inplace=True)
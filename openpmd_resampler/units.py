@@ -3,8 +3,8 @@ This module defines the units for various physical quantities used in the simula
 """
 from dataclasses import dataclass, field
 from enum import Enum
+from typing import Tuple
 
-import numpy as np
 import scipy.constants as const
 
 
@@ -29,18 +29,12 @@ units = {
 
 @dataclass(frozen=True)
 class ExpectedDims:
-    position: np.ndarray = field(
-        default_factory=lambda: np.array([1.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0])
-    )
-    positionOffset: np.ndarray = field(
-        default_factory=lambda: np.array([1.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0])
-    )
-    momentum: np.ndarray = field(
-        default_factory=lambda: np.array([1.0, 1.0, -1.0, 0.0, 0.0, 0.0, 0.0])
-    )
-    weights: np.ndarray = field(
-        default_factory=lambda: np.array([0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0])
-    )
+    """Unit dimensions of the records, as openPMD 7-tuples of SI base unit powers."""
+
+    position: Tuple[float, ...] = (1.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0)
+    positionOffset: Tuple[float, ...] = (1.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0)
+    momentum: Tuple[float, ...] = (1.0, 1.0, -1.0, 0.0, 0.0, 0.0, 0.0)
+    weights: Tuple[float, ...] = (0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0)
 
 
 expected_dims = ExpectedDims()
@@ -3,8 +3,9 @@ This module provides various utility functions.
 """
 import os
 import tempfile
-from typing import List
+from typing import Iterator, List, Tuple, Union
 
+import numpy as np
 import pandas as pd
 from PIL import Image
 
@@ -21,25 +22,74 @@ def thousand_separators(number):
     return f"{number:,}"
 
 
-def describe(df):
-    desc = pd.DataFrame(index=['count', 'mean', 'std', 'min', 'max'])
+CHUNK_SIZE = 1 << 16
+
+
+def chunks(values: np.ndarray, chunk_size: int = CHUNK_SIZE) -> Iterator[np.ndarray]:
+    """
+    Consecutive cache-sized slices of ``values``.
+
+    Running several reductions on each chunk before moving on to the next reads
+    the array from memory only once, instead of once for each reduction. This
+    pays off when the work per chunk outweighs the Python loop overhead: measured
+    on 2e7 elements, it does for the five reductions of ``column_stats`` in any
+    precision, but for the two of ``histograms.min_max`` only in double precision.
+    """
+    for start in range(0, values.size, chunk_size):
+        yield values[start : start + chunk_size]
+
+
+def column_stats(values: np.ndarray) -> Tuple[int, float, float, float, float]:
+    """
+    Count, mean, standard deviation, minimum and maximum of ``values``, ignoring NaNs,
+    in a single sweep over memory, see ``chunks``.
 
-    for col in df.columns:
-        desc.loc['count', col] = df[col].count()
-        desc.loc['mean', col] = df[col].mean()
-        desc.loc['std', col] = df[col].std()
-        desc.loc['min', col] = df[col].min()
-        desc.loc['max', col] = df[col].max()
+    The sums are accumulated in float64, relative to the first value, so that
+    the variance does not suffer from cancellation.
+    """
+    count, total, total_sq = 0, 0.0, 0.0
+    lo, hi = np.inf, -np.inf
+    shift = None
+    for chunk in chunks(values):
+        nan = np.isnan(chunk)
+        if nan.any():
+            chunk = chunk[~nan]
+        if chunk.size == 0:
+            continue
+        if shift is None:
+            shift = float(chunk[0])
+        deviations = chunk.astype(np.float64) - shift
+        count += deviations.size
+        total += deviations.sum()
+        total_sq += np.dot(deviations, deviations)
+        lo = min(lo, chunk.min())
+        hi = max(hi, chunk.max())
+
+    if count == 0:
+        return 0, np.nan, np.nan, np.nan, np.nan
+    mean = total / count
+    if count == 1:
+        return count, mean + shift, np.nan, lo, hi
+    variance = max(total_sq - count * mean**2, 0.0) / (count - 1)
+    return count, mean + shift, np.sqrt(variance), lo, hi
+
+
+def describe(df):
+    return pd.DataFrame(
+        {col: column_stats(df[col].to_numpy()) for col in df.columns},
+        index=["count", "mean", "std", "min", "max"],
+        dtype=np.float64,
+    )
 
-    return desc
 
 def dataset_info(df: pd.DataFrame) -> None:
+    total_weight = int(df["weights"].sum())
     logger.info(
         "The dataset contains %s macroparticles, corresponding to %s 'real' electrons, "
         "with a total charge of %.2f pC.\n",
         thousand_separators(df.shape[0]),
-        thousand_separators(int(df["weights"].sum())),
-        int(df["weights"].sum()) * constants.electron_charge_picocoulombs,
+        thousand_separators(total_weight),
+        total_weight * constants.electron_charge_picocoulombs,
     )
     logger.info("Descriptive statistics of the dataset:\n")
     logger.info("```\n")
@@ -66,34 +116,35 @@ def unique_filename(suffix: str) -> str:
     return temp_filename
 
 
-def combine_images(filenames: List[str], output_filename: str) -> None:
+def combine_images(
+    filenames: List[Union[str, np.ndarray]], output_filename: str
+) -> None:
     """
     This function combines multiple images into a single image vertically.
     All images are assumed to have the same width.
     The images are combined in the order they are provided in the list of filenames.
 
     Parameters:
-    filenames (List[str]): List of filenames of the images to be combined.
+    filenames (List[Union[str, np.ndarray]]): List of filenames, or RGB pixel arrays,
+        of the images to be combined.
     output_filename (str): The filename of the output image.
 
     Returns:
     None
     """
 
-    images = [Image.open(filename) for filename in filenames]
-
-    # Assume all images have the same width
-    width = images[0].width
-    # Height of final image
-    height = sum(image.height for image in images)
-
-    final_image = Image.new("RGB", (width, height))
-
-    # Paste the images onto the final image vertically
-    y_offset = 0
-    for image in images:
-        final_image.paste(image, (0, y_offset))
-        y_offset += image.height
+    # Stack the pixel arrays vertically, with a single allocation for the final image
+    final_image = Image.fromarray(
+        np.concatenate(
+            [
+                filename
+                if isinstance(filename, np.ndarray)
+                else np.asarray(Image.open(filename).convert("RGB"))
+                for filename in filenames
+            ],
+            axis=0,
+        )
+    )
 
     # Ensure the directory exists
     os.makedirs(os.path.dirname(output_filename), exist_ok=True)
@@ -1,7 +1,8 @@
 import itertools
 import os
 from abc import ABC, abstractmethod
-from typing import Optional
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Optional
 
 import matplotlib.patches as mpatches
 import numpy as np
@@ -17,9 +18,15 @@ from .histograms import (
     StandardHistogram,
     EqualWeightHistogram,
 )
-from .image_plots import StandardDataShaderPlot
+from .image_plots import StandardImagePlot
+from .log import logger
 from .plot_utils import galactic_spectrum
-from .utils import combine_images, unique_filename
+from .utils import combine_images, thousand_separators, unique_filename
+
+
+def render_rgb(fig_layout: FigureLayout) -> np.ndarray:
+    """Rasterize the figure of ``fig_layout`` into an array of pixels."""
+    return fig_layout.to_rgb()
 
 
 class MultiplePanelPlotter(ABC):
@@ -38,11 +45,11 @@ class MultiplePanelPlotter(ABC):
         self,
         df,
         output_filename=None,
+        arrays: Optional[Dict[str, np.ndarray]] = None,
     ):
         self.df = df
-        self.output_filename = (
-            output_filename if output_filename is not None else unique_filename(".png")
-        )
+        self.output_filename = output_filename
+        self.arrays = arrays
         self.fig_layout = FigureLayout(layout=self.layout)
 
     @abstractmethod
@@ -54,12 +61,26 @@ class MultiplePanelPlotter(ABC):
         and use the plotter on each panel.
         """
 
+    def column(self, col) -> np.ndarray:
+        """
+        The values of column ``col``, taken from the precomputed arrays if available.
+        """
+        if self.arrays is not None and col in self.arrays:
+            return self.arrays[col]
+        return self.df[col].to_numpy()
+
     def create_plot(self):
         if not hasattr(self, "plotters") or not self.plotters:
             self.plot_panels()
         return self
 
-    def savefig(self):
+    def savefig(self) -> str:
+        """
+        Save the figure to ``output_filename``.
+        Without an ``output_filename``, a unique temporary file is created.
+        """
+        if self.output_filename is None:
+            self.output_filename = unique_filename(".png")
         self.fig_layout.savefig(self.output_filename)
         return self.output_filename
 
@@ -69,8 +90,8 @@ class MultipleHistogramPlotter(MultiplePanelPlotter):
     energy_col = "energy_mev"
     energy_label = "Energy (MeV)"
 
-    def __init__(self, df, output_filename=None):
-        super().__init__(df, output_filename)
+    def __init__(self, df, output_filename=None, arrays=None):
+        super().__init__(df, output_filename, arrays)
         self.plotters = []
 
     def add_legend(self, primary_label, secondary_label):
@@ -96,18 +117,22 @@ class MultipleHistogramPlotter(MultiplePanelPlotter):
             for col, feature in enumerate(feature_set):
                 y_label = None if col == 0 else ""
                 ax = self.fig_layout.get_ax(row, col)
-                histogram = StandardHistogram(self.df, feature, self.weight_col)
+                histogram = StandardHistogram(
+                    self.df, feature, self.weight_col, self.arrays
+                )
                 plotter = StandardHistogramPlot(histogram, ax, label_set[col], y_label)
                 self.plotters.append(plotter)
 
         # last row, 2 columns
         ax = self.fig_layout.get_ax(2, 0)
-        histogram = EqualWeightHistogram(self.df, self.weight_col)
+        histogram = EqualWeightHistogram(self.df, self.weight_col, self.arrays)
         plotter = EqualWeightDistributionPlot(histogram, ax)
         self.plotters.append(plotter)
 
         ax = self.fig_layout.get_ax(2, 1)
-        histogram = StandardHistogram(self.df, self.energy_col, self.weight_col)
+        histogram = StandardHistogram(
+            self.df, self.energy_col, self.weight_col, self.arrays
+        )
         plotter = LogHistogramPlot(histogram, ax, self.energy_label)
         self.plotters.append(plotter)
 
@@ -172,12 +197,19 @@ class MultipleImagePlotter(MultiplePanelPlotter):
     cbar_label = "Number of 'real' electrons"
     norm = None
 
+    def __init__(self, df, output_filename=None, arrays=None, vmin=None):
+        super().__init__(df, output_filename, arrays)
+        # Lower bound of the color scale, the smallest weight if not given
+        self.vmin = vmin
+
     def add_title(self, title):
         self.fig_layout.fig.suptitle(title)
         return self
 
     def compute_vmax(self):
-        std_hist = StandardHistogram(self.df, self.df.columns[0], self.weight_col)
+        std_hist = StandardHistogram(
+            self.df, self.df.columns[0], self.weight_col, self.arrays
+        )
         _, density = std_hist.compute_histogram()
 
         order_of_magnitude = np.floor(np.log10(density.max()))
@@ -186,11 +218,30 @@ class MultipleImagePlotter(MultiplePanelPlotter):
     def compute_norm(self):
         if self.norm is None:
             vmax = self.compute_vmax()
-            self.norm = LogNorm(vmin=self.df[self.weight_col].min(), vmax=vmax)
+            vmin = self.vmin
+            if vmin is None:
+                vmin = self.column(self.weight_col).min()
+            self.norm = LogNorm(vmin=vmin, vmax=vmax)
         return self.norm
 
-    def add_colorbar(self):
+    @staticmethod
+    def shared_norm(*plotters: "MultipleImagePlotter") -> LogNorm:
+        """
+        A norm spanning the color ranges of all the ``plotters``, so that their
+        images can be compared on the same color scale.
+        """
+        norms = [plotter.compute_norm() for plotter in plotters]
+        return LogNorm(
+            vmin=min(norm.vmin for norm in norms),
+            vmax=max(norm.vmax for norm in norms),
+        )
+
+    def make_room_for_colorbar(self):
+        # Lay out the panels first, then shrink them to fit the colorbar
+        self.fig_layout.tight_layout()
         self.fig_layout.fig.subplots_adjust(right=0.91)
+
+    def add_colorbar(self):
         cax = self.fig_layout.fig.add_axes([0.92, 0.15, 0.025, 0.7])
 
         # Create a "fake" ScalarMappable with the colormap and norm
@@ -203,8 +254,11 @@ class MultipleImagePlotter(MultiplePanelPlotter):
         return cbar
 
     def create_plot(self):
-        super().create_plot()
+        # The panels are aggregated at their pixel size, so fix it beforehand
+        self.make_room_for_colorbar()
+        # All the panels share the norm of the colorbar
         self.compute_norm()
+        super().create_plot()
         self.add_colorbar()
         return self
 
@@ -220,45 +274,45 @@ class EmittancePlotter(MultipleImagePlotter):
                 zip(self.momentum_features, self.momentum_labels)
             ):
                 ax = self.fig_layout.get_ax(row, col)
-                plotter = StandardDataShaderPlot(
-                    ax, self.df, position, momentum, position_label, momentum_label
+                plotter = StandardImagePlot(
+                    ax,
+                    self.df,
+                    position,
+                    momentum,
+                    position_label,
+                    momentum_label,
+                    self.norm,
+                    self.arrays,
                 )
                 plotter.create_plot(add_cbar=False)
 
 
 class BunchPlotter(MultipleImagePlotter):
     layout = (3, 3)
+    # Indices of the (x, y) features of each panel, in the position and momentum rows
+    position_panels = ((0, 1), (2, 0), (2, 1))
+    momentum_panels = ((0, 1), (0, 2), (1, 2))
 
     def plot_panels(self):
-        coords = {
-            coord: (feature, label)
-            for coord, feature, label in zip(
-                ["x", "y", "z"], self.position_features, self.position_labels
-            )
-        }
-        p = {
-            coord: (feature, label)
-            for coord, feature, label in zip(
-                ["x", "y", "z"], self.momentum_features, self.momentum_labels
-            )
-        }
-        axes_pos = (
-            (coords["x"], coords["y"]),
-            (coords["z"], coords["x"]),
-            (coords["z"], coords["y"]),
-        )
-        axes_mom = ((p["x"], p["y"]), (p["x"], p["z"]), (p["y"], p["z"]))
-        combined_axes = itertools.chain(axes_pos, axes_mom)
-
-        num_cols = self.layout[0]
-        for i, ((x_col, x_label), (y_col, y_label)) in enumerate(combined_axes):
-            row = i // num_cols
-            col = i % num_cols
-            ax = self.fig_layout.get_ax(row, col)
-            plotter = StandardDataShaderPlot(
-                ax, self.df, x_col, y_col, x_label, y_label
+        for row, (features, labels, panels) in enumerate(
+            (
+                (self.position_features, self.position_labels, self.position_panels),
+                (self.momentum_features, self.momentum_labels, self.momentum_panels),
             )
-            plotter.create_plot(add_cbar=False)
+        ):
+            for col, (i, j) in enumerate(panels):
+                ax = self.fig_layout.get_ax(row, col)
+                plotter = StandardImagePlot(
+                    ax,
+                    self.df,
+                    features[i],
+                    features[j],
+                    labels[i],
+                    labels[j],
+                    self.norm,
+                    self.arrays,
+                )
+                plotter.create_plot(add_cbar=False)
 
 
 class PhaseSpaceVisualizer:
@@ -266,13 +320,33 @@ class PhaseSpaceVisualizer:
         self,
         df: pd.DataFrame,
         label: Optional[str] = None,
+        subsample: bool = True,
     ):
+        """
+        With ``subsample=False``, the image panels show all the particles,
+        see ``_subsample`` for the trade-off.
+        """
         self.df = df
         self.label = label
 
-        self.bunch_plotter = BunchPlotter(self.df)
-        self.histogram_plotter = MultipleHistogramPlotter(self.df)
-        self.emittance_plotter = EmittancePlotter(self.df)
+        # Extract the columns once, to be shared by all the plotters
+        self._arrays = self._column_arrays(self.df)
+
+        # 1D histograms are cheap, so only the image panels get the subsample.
+        # Single precision is plenty for binning onto the image pixels.
+        image_data = self._subsample() if subsample else self.df
+        self._arrays_f32 = self._column_arrays(image_data, dtype=np.float32)
+        image_df = pd.DataFrame(self._arrays_f32, copy=False)
+
+        # The color scale starts at the smallest weight of the full data,
+        # whether or not the images show a subsample
+        vmin = self._arrays[MultiplePanelPlotter.weight_col].min()
+
+        self.bunch_plotter = BunchPlotter(image_df, arrays=self._arrays_f32, vmin=vmin)
+        self.histogram_plotter = MultipleHistogramPlotter(self.df, arrays=self._arrays)
+        self.emittance_plotter = EmittancePlotter(
+            image_df, arrays=self._arrays_f32, vmin=vmin
+        )
 
         self.plotters = [
             self.bunch_plotter,
@@ -280,22 +354,100 @@ class PhaseSpaceVisualizer:
             self.emittance_plotter,
         ]
 
+    @staticmethod
+    def _column_arrays(df: pd.DataFrame, dtype=np.float64) -> Dict[str, np.ndarray]:
+        """
+        Contiguous arrays of the columns used for plotting, as ``dtype``.
+        """
+        columns = itertools.chain(
+            MultiplePanelPlotter.position_features,
+            MultiplePanelPlotter.momentum_features,
+            (MultiplePanelPlotter.weight_col, MultipleHistogramPlotter.energy_col),
+        )
+        return {
+            col: np.ascontiguousarray(df[col].to_numpy(dtype=dtype))
+            for col in columns
+            if col in df.columns
+        }
+
+    def _subsample(self, target_pixels: int = 90000) -> pd.DataFrame:
+        """
+        Draw a weighted subsample of the particles, sized to the image resolution.
+
+        Following the vizketch analysis of Hillview (Budiu et al., VLDB 2019),
+        rendering onto a canvas of ``target_pixels`` pixels only requires a number
+        of samples which depends on the canvas resolution, not on the dataset size.
+        Particles are drawn with probability proportional to their weight, and all
+        samples get the same weight, conserving the number of 'real' electrons.
+
+        This costs dynamic range on the log color scale: each pixel then holds
+        a multiple of the sample weight, total weight / number of samples, so
+        sparse pixels which hold fewer 'real' electrons than that, such as in
+        the halo of the bunch, are either left empty or rounded up to it.
+        """
+        number_of_macroparticles = self.df.shape[0]
+        number_of_samples = min(number_of_macroparticles, 200 * target_pixels)
+        if number_of_samples == number_of_macroparticles:
+            return self.df
+
+        weight_col = MultiplePanelPlotter.weight_col
+        weights = self._arrays[weight_col]
+        total_weight = weights.sum()
+
+        random_generator = np.random.default_rng(seed=42)
+        indices = random_generator.choice(
+            number_of_macroparticles,
+            size=number_of_samples,
+            p=weights / total_weight,
+        )
+
+        sample = self.df.iloc[indices].reset_index(drop=True)
+        sample[weight_col] = total_weight / number_of_samples
+        logger.info(
+            "The images show a subsample of %s macroparticles, so pixels with less "
+            "than %.2e 'real' electrons are not resolved.\n",
+            thousand_separators(number_of_samples),
+            total_weight / number_of_samples,
+        )
+        return sample
+
     def create_plot(self):
         for plotter in self.plotters:
             plotter.create_plot()
         return self
 
-    def savefig(self, output_filename: str):
-        output_filenames = []
-        for plotter in self.plotters:
-            fname = plotter.savefig()
-            output_filenames.append(fname)
+    def savefig(self, output_filename: str, max_workers: Optional[int] = None):
+        """
+        Render the plots in memory, and only write the combined image to disk.
+        The figures are stitched as raw pixels, so only the final image is
+        encoded as PNG.
+
+        The figures are independent, so they are rasterized in parallel worker
+        processes, which only receive the figures and not the particle data.
+        Threads cannot be used instead, since matplotlib's mathtext parser is
+        not thread-safe.
+        """
+        fig_layouts = [plotter.fig_layout for plotter in self.plotters]
+        if max_workers is None:
+            max_workers = min(len(fig_layouts), os.cpu_count() or 1)
 
-        # Combine the plots
-        combine_images(output_filenames, output_filename)
-        # Delete the temporary files
-        for fname in output_filenames:
-            os.remove(fname)
+        if max_workers > 1:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                images = list(executor.map(render_rgb, fig_layouts))
+        else:
+            images = [render_rgb(fig_layout) for fig_layout in fig_layouts]
+
+        combine_images(images, output_filename)
+
+    def has_same_total_weight(self, other, rtol: float = 0.05) -> bool:
+        """
+        Whether both datasets correspond to the same number of 'real' electrons,
+        up to the statistical fluctuations of the resampling.
+        """
+        weight_col = MultiplePanelPlotter.weight_col
+        return np.isclose(
+            self._arrays[weight_col].sum(), other._arrays[weight_col].sum(), rtol=rtol
+        )
 
     def __add__(self, other):
         if not isinstance(other, type(self)):
@@ -308,6 +460,20 @@ class PhaseSpaceVisualizer:
 
         comparative_histogram_plotter = self.histogram_plotter + other.histogram_plotter
 
+        # Show the images of both datasets on the same color scale, but only if
+        # their weights count the same 'real' electrons, which is no longer
+        # the case once the weights have been set to 1 after resampling
+        if self.has_same_total_weight(other):
+            image_plotters = (
+                self.bunch_plotter,
+                other.bunch_plotter,
+                self.emittance_plotter,
+                other.emittance_plotter,
+            )
+            norm = MultipleImagePlotter.shared_norm(*image_plotters)
+            for plotter in image_plotters:
+                plotter.norm = norm
+
         self.plotters = [
             self.bunch_plotter.add_title(self.label),
             other.bunch_plotter.add_title(other.label),
@@ -4,6 +4,7 @@ visualizing phase space, resampling particles, and writing the results to a text
 """
 import argparse
 from pathlib import Path
+from typing import List, Optional
 
 from openpmd_resampler.df_to_txt import DataFrameToFile
 from openpmd_resampler.reader import ParticleDataReader
@@ -11,7 +12,7 @@ from openpmd_resampler.resampling import ParticleResampler
 from openpmd_resampler.visualize_phase_space import PhaseSpaceVisualizer
 
 
-def main():
+def main(argv: Optional[List[str]] = None):
     # Parse command line arguments
     parser = argparse.ArgumentParser()
     parser.add_argument("--opmd_path", type=str, help="Path to the OpenPMD file")
@@ -23,22 +24,55 @@ def main():
                         help="If set, the phase space plot will not be created.")
     parser.add_argument("--no_csv", action="store_true",
                         help="If set, the resulting dataframe will not be saved to file.")
+    parser.add_argument("--no_stats", action="store_true",
+                        help="If set, the statistics of the input dataset will not be logged.")
+    parser.add_argument("--cache", action="store_true",
+                        help="If set, the particle data is cached as Parquet next to the "
+                        "OpenPMD file, and reused by later runs. Requires pyarrow.")
+    parser.add_argument("--compare", action="store_true",
+                        help="If set, the phase space of the original and resampled data "
+                        "are plotted side by side.")
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     opmd_path = Path(args.opmd_path)
     particle_species_name = args.species
     reduction_factor = args.reduction_factor
     no_plot = args.no_plot
     no_csv = args.no_csv
+    no_stats = args.no_stats
+    compare = args.compare
+    cache_path = None
+    if args.cache:
+        try:
+            ParticleDataReader.check_cache_support()
+        except ImportError as error:
+            parser.error(f"--cache: {error}")
+        cache_path = ParticleDataReader.cache_path_for(opmd_path, particle_species_name)
 
     # Create the dataframe
-    df = ParticleDataReader.from_file(opmd_path, particle_species_name=particle_species_name)
+    df = ParticleDataReader.from_file(
+        opmd_path,
+        particle_species_name=particle_species_name,
+        cache_path=cache_path,
+        verbose=not no_stats,
+    )
 
     # Apply thinning algorithm to df, resulting in df_thin
     resampler = ParticleResampler(df)
     df_thin = resampler.global_leveling_thinning(k=reduction_factor).set_weights_to(1).finalize()
 
-    if not no_plot:
+    if compare and not no_plot:
+        # Visualize both dataframes in order to see effects of thining
+        phase_space = PhaseSpaceVisualizer(df, label="PIC data")
+        phase_space_thin = PhaseSpaceVisualizer(df_thin, label="Resampled data")
+        comparative_phase_space = phase_space + phase_space_thin
+        comparative_phase_space.create_plot().savefig("plots/comparative_phase_space.png")
+
+    # Only the thinned data is needed from here on, so free the full dataset,
+    # rather than keeping both in memory
+    del df, resampler
+
+    if not compare and not no_plot:
         phase_space_thin = PhaseSpaceVisualizer(df_thin, label="Resampled data")
         phase_space_thin.create_plot().savefig("./phase_space.png")
 